@@ -1,18 +1,49 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request, Query
+from fastapi.responses import ORJSONResponse, PlainTextResponse, Response
 from pydantic import BaseModel, HttpUrl
 from youtube_transcript_api import YouTubeTranscriptApi
 import uvicorn
-import requests
+import httpx
+import redis.asyncio as redis
 from dotenv import dotenv_values
 import sqlite3
-from datetime import datetime
-from urllib.parse import urlparse, parse_qs
-from typing import List
+import zstandard
+from contextlib import contextmanager
+from functools import lru_cache
+from collections import OrderedDict
+from cachetools import TTLCache
+from typing import List, Dict, Optional
+import threading
+import time
+import asyncio
+import re
+import queue
 import os
 import logging
 
 DB_PATH = r"/app/data/" # Adjust this path as needed
 DB_NAME = 'video_transcripts.db'
+DB_FULL_PATH = os.path.join(DB_PATH, DB_NAME)
+DB_READERS = 4 # Number of pooled read-only connections
+DB_PRAGMAS = ('PRAGMA synchronous=NORMAL',
+              'PRAGMA temp_store=MEMORY',
+              'PRAGMA cache_size=-64000')
+VIDEO_CACHE_SIZE = 1024 # Number of videos kept in the in-process cache
+METAINFO_CACHE_SIZE = 10_000 # Number of video snippets kept from the YouTube Data API
+METAINFO_CACHE_TTL = 3600 # Seconds
+WRITE_BATCH_SIZE = 64 # Maximum number of rows committed in one transaction
+WRITE_BATCH_WAIT = 0.1 # Seconds the writer waits for more rows before committing
+WRITE_QUEUE_SIZE = 256 # Maximum number of rows waiting for the writer, inserts wait when full
+WRITE_RETRIES = 3 # Attempts per batch before the rows are dropped
+WRITE_RETRY_WAIT = 1.0 # Seconds before the first retry, grows linearly per attempt
+REDIS_URL = os.getenv("REDIS_URL") # Optional cache shared by all workers, disabled if not set
+REDIS_TTL = 30 * 86400 # Seconds
+REDIS_TIMEOUT = 0.5 # Seconds for connecting and for each command, Redis is only a cache
+ZSTD_LEVEL = 3 # Compression level of stored transcripts
+ZSTD_MAGIC = b'\x28\xb5\x2f\xfd'
+
+# Matches youtu.be/<id>, youtube.com/watch?...v=<id>, youtube.com/embed/<id> and youtube.com/v/<id>
+VIDEO_ID_RE = re.compile(r'https?://(?:www\.)?(?:youtu\.be/|youtube\.com/(?:watch\?(?:[^#]*?&)??v=|embed/|v/))([A-Za-z0-9_-]{11})(?![A-Za-z0-9_-])')
 
 logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
@@ -25,120 +56,447 @@ try:
 except:
     logger.warning('Unable to load .env file!')
 
-app = FastAPI()
+# Validate the API key once instead of on every request
+YOUTUBE_KEY = config.get("YOUTUBE_KEY")
+if not YOUTUBE_KEY or len(YOUTUBE_KEY) <= 10:
+    logger.error('Failed to obtain valid API key!')
+    YOUTUBE_KEY = None
+
+app = FastAPI(default_response_class=ORJSONResponse)
 
 class VideoRequest(BaseModel):
     url: HttpUrl
 
-def get_db_connection():
-    return sqlite3.connect(os.path.join(DB_PATH, DB_NAME))
+class ConnPool:
+    """
+    Process-wide pool of SQLite connections: one writer and a queue of read-only readers.
+    """
+    def __init__(self, db_file, readers=DB_READERS):
+        # Writer runs in autocommit mode, access is serialized with a lock
+        self.writer = self._connect(db_file, isolation_level=None)
+        self.writer.execute('PRAGMA journal_mode=WAL')
+        self.writer.execute('PRAGMA wal_autocheckpoint=1000')
+        self.write_lock = threading.Lock()
+        self.readers = queue.Queue(maxsize=readers)
+        for _ in range(readers):
+            self.readers.put(self._connect(f"file:{db_file}?mode=ro", uri=True))
+
+    @staticmethod
+    def _connect(database, **kwargs):
+        conn = sqlite3.connect(database, check_same_thread=False, **kwargs)
+        conn.row_factory = sqlite3.Row
+        for pragma in DB_PRAGMAS:
+            conn.execute(pragma)
+        return conn
+
+    @contextmanager
+    def reader(self):
+        conn = self.readers.get()
+        try:
+            yield conn
+        finally:
+            self.readers.put(conn)
+
+    @contextmanager
+    def write(self):
+        with self.write_lock:
+            yield self.writer
+
+db_pool = None
+
+@contextmanager
+def get_db_connection(write=False):
+    """
+    Borrows a pooled connection, the writer if write=True and a read-only connection otherwise.
+    """
+    with (db_pool.write() if write else db_pool.reader()) as conn:
+        yield conn
+
+class VideoCache:
+    """
+    Thread-safe LRU cache of video rows keyed by video ID.
+    """
+    def __init__(self, maxsize=VIDEO_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, video_id):
+        with self._lock:
+            result = self._data.get(video_id)
+            if result is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(video_id)
+            self.hits += 1
+            return result
+
+    def put(self, video_id, result):
+        with self._lock:
+            self._data[video_id] = result
+            self._data.move_to_end(video_id)
+            if len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def discard(self, video_id):
+        with self._lock:
+            self._data.pop(video_id, None)
+
+    def info(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses,
+                    'size': len(self._data), 'maxsize': self.maxsize}
+
+video_cache = VideoCache()
 
 def init_db():
+    """
+    Creates the videos table and the connection pool, runs at most once per process.
+    """
+    global db_pool
+    if db_pool is not None:
+        return
     logger.debug(f"Initializing database at {DB_PATH}")
-    logger.debug(f"Current working directory: {os.getcwd()}")
-    logger.debug(f"Directory contents: {os.listdir(DB_PATH)}")
-    conn = get_db_connection()
-    c = conn.cursor()
-    c.execute('''CREATE TABLE IF NOT EXISTS videos
+    if os.getenv("DEBUG_DB_INIT"):
+        logger.debug(f"Current working directory: {os.getcwd()}")
+        logger.debug(f"Directory contents: {os.listdir(DB_PATH)}")
+    # Writer creates the database file before read-only connections are opened
+    writer = ConnPool._connect(DB_FULL_PATH)
+    writer.execute('''CREATE TABLE IF NOT EXISTS videos
                  (id INTEGER PRIMARY KEY AUTOINCREMENT,
                   video_id TEXT UNIQUE,
                   url TEXT,
                   title TEXT,
                   description TEXT,
-                  transcript TEXT,
+                  transcript BLOB,
                   processed_at TIMESTAMP)''')
-    conn.commit()
-    conn.close()
+    # Lookups by video_id use the index SQLite creates for the UNIQUE constraint
+    writer.commit()
+    writer.close()
+    db_pool = ConnPool(DB_FULL_PATH)
     logger.debug("Database initialized successfully")
 
-def insert_video_data(video_id, url, title, description, transcript):
-    logger.info(f"Inserting data for video {video_id}")
-    conn = get_db_connection()
-    c = conn.cursor()
-    c.execute('''INSERT OR REPLACE INTO videos 
-                 (video_id, url, title, description, transcript, processed_at)
-                 VALUES (?, ?, ?, ?, ?, ?)''',
-              (video_id, url, title, description, transcript, datetime.now()))
-    conn.commit()
-    conn.close()
-    logger.info(f"Data inserted successfully for video {video_id}")
+def compress_transcript(transcript):
+    return zstandard.compress(transcript.encode('utf-8'), level=ZSTD_LEVEL)
+
+def is_compressed(stored):
+    return isinstance(stored, bytes) and stored.startswith(ZSTD_MAGIC)
+
+def decompress_transcript(stored):
+    """
+    Decodes a stored transcript, rows written before compression was added are returned as is.
+    """
+    if is_compressed(stored):
+        return zstandard.decompress(stored).decode('utf-8')
+    return stored
+
+# Same SQL text every time, so sqlite3 reuses the prepared statement on the writer connection
+INSERT_VIDEO_SQL = '''INSERT OR REPLACE INTO videos 
+                      (video_id, url, title, description, transcript, processed_at)
+                      VALUES (?, ?, ?, ?, ?, ?)'''
+
+write_queue = None # asyncio.Queue of rows for video_writer, created on startup
+
+async def insert_video_data(video_id, url, title, description, transcript, compressed):
+    """
+    Queues video data for the background writer, the cache is updated immediately.
+    compressed is the output of compress_transcript(transcript), shared with Redis so it is only computed once.
+    Waits for room if the write queue is full.
+    """
+    logger.info(f"Queueing data for video {video_id}")
+    video_cache.put(video_id, {'transcript': transcript})
+    processed_at = time.strftime('%Y-%m-%d %H:%M:%S')
+    await write_queue.put((video_id, url, title, description, compressed, processed_at))
+
+def write_video_rows(rows):
+    """
+    Writes a batch of queued rows in a single transaction.
+    """
+    with get_db_connection(write=True) as conn:
+        conn.execute('BEGIN')
+        try:
+            conn.executemany(INSERT_VIDEO_SQL, rows)
+            conn.execute('COMMIT')
+        except:
+            conn.execute('ROLLBACK')
+            raise
+    logger.info(f"Data inserted successfully for videos {[row[0] for row in rows]}")
+
+async def video_writer():
+    """
+    Drains the write queue in batches until the shutdown sentinel (None) is received.
+    """
+    running = True
+    while running:
+        rows = [await write_queue.get()]
+        # Give concurrent requests a moment to join the batch
+        await asyncio.sleep(WRITE_BATCH_WAIT)
+        while len(rows) < WRITE_BATCH_SIZE and not write_queue.empty():
+            rows.append(write_queue.get_nowait())
+        if None in rows:
+            running = False
+            rows = [row for row in rows if row is not None]
+        if rows:
+            await write_with_retries(rows)
+
+async def write_with_retries(rows):
+    """
+    Writes a batch, retrying on failure (e.g. SQLITE_BUSY from another worker's writer).
+    If all attempts fail the rows are dropped from the cache, so the videos are processed again on the next request.
+    """
+    for attempt in range(1, WRITE_RETRIES + 1):
+        try:
+            await asyncio.to_thread(write_video_rows, rows)
+            return
+        except Exception as e:
+            logger.error(f"Failed to write {len(rows)} videos into database (attempt {attempt}/{WRITE_RETRIES}): {str(e)}")
+            if attempt < WRITE_RETRIES:
+                await asyncio.sleep(WRITE_RETRY_WAIT * attempt)
+    for row in rows:
+        video_cache.discard(row[0])
+    await redis_delete_transcripts([row[0] for row in rows])
+    logger.error(f"Gave up writing videos {[row[0] for row in rows]} into database")
 
 def get_video_from_db(video_id):
+    """
+    Returns the video data and the transcript exactly as stored, or (None, None) if not found.
+    """
     logger.debug(f"Fetching data for video {video_id}")
-    conn = get_db_connection()
-    c = conn.cursor()
-    c.execute('SELECT title, description, transcript FROM videos WHERE video_id = ?', (video_id,))
-    result = c.fetchone()
-    conn.close()
+    with get_db_connection() as conn:
+        c = conn.execute('SELECT transcript FROM videos WHERE video_id = ?', (video_id,))
+        result = c.fetchone()
     if result:
         logger.debug(f"Data found for video {video_id}")
-        return {'title': result[0], 'description': result[1], 'transcript': result[2]}
+        stored = result['transcript']
+        return {'transcript': decompress_transcript(stored)}, stored
     logger.debug(f"No data found for video {video_id}")
-    return None
+    return None, None
+
+redis_client = None # Created on startup if REDIS_URL is set
 
-def get_video_description(video_id):
+async def redis_get_transcript(video_id):
+    if redis_client is None:
+        return None
+    try:
+        cached = await redis_client.get(f"yt:{video_id}")
+    except Exception as e:
+        logger.warning(f"Failed to read video {video_id} from Redis: {str(e)}")
+        return None
+    if cached is None:
+        return None
+    return await asyncio.to_thread(decompress_transcript, cached)
+
+async def redis_set_transcript(video_id, stored):
     """
-    Fetches the video description using the YouTube Data API.
+    Stores a transcript in Redis, stored is compressed here only if it comes from a row written before compression was added.
     """
+    if redis_client is None:
+        return
     try:
-        api_key = config["YOUTUBE_KEY"]
-        assert len(api_key) > 10
-    except:
-        logger.error('Failed to obtain valid API key!')
+        compressed = stored if is_compressed(stored) else await asyncio.to_thread(compress_transcript, stored)
+        await redis_client.setex(f"yt:{video_id}", REDIS_TTL, compressed)
+    except Exception as e:
+        logger.warning(f"Failed to write video {video_id} to Redis: {str(e)}")
+
+async def redis_delete_transcripts(video_ids):
+    if redis_client is None:
+        return
+    try:
+        await redis_client.delete(*(f"yt:{video_id}" for video_id in video_ids))
+    except Exception as e:
+        logger.warning(f"Failed to delete videos {video_ids} from Redis: {str(e)}")
+
+background_tasks = set() # References to fire-and-forget tasks, so they are not garbage collected while running
+
+def run_in_background(coro):
+    task = asyncio.create_task(coro)
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
+
+async def get_stored_video(video_id):
+    """
+    Looks up an already processed video from the in-process cache, Redis and the database, in that order.
+    """
+    cached = video_cache.get(video_id)
+    if cached:
+        logger.debug(f"Data found in cache for video {video_id}")
+        return cached
+
+    transcript = await redis_get_transcript(video_id)
+    if transcript is not None:
+        logger.debug(f"Data found in Redis for video {video_id}")
+        data = {'transcript': transcript}
+        video_cache.put(video_id, data)
+        return data
+
+    # Blocking SQLite call is run in a worker thread to keep the event loop free
+    data, stored = await asyncio.to_thread(get_video_from_db, video_id)
+    if data:
+        video_cache.put(video_id, data)
+        # Backfill Redis with the stored bytes, without delaying the response
+        run_in_background(redis_set_transcript(video_id, stored))
+    return data
+
+# Only touched from the event loop, so no locking is needed
+metainfo_cache = TTLCache(maxsize=METAINFO_CACHE_SIZE, ttl=METAINFO_CACHE_TTL)
+
+async def get_video_description(video_id):
+    """
+    Fetches the video description using the YouTube Data API.
+    """
+    cached = metainfo_cache.get(video_id)
+    if cached:
+        return cached
+
+    if YOUTUBE_KEY is None:
         return {"title": "not available", "description": "not available"}
 
-    url = f"https://www.googleapis.com/youtube/v3/videos?part=snippet&id={video_id}&key={api_key}"
+    # API key is sent in the X-Goog-Api-Key header of the shared client, so it never appears in logged URLs
+    url = f"https://www.googleapis.com/youtube/v3/videos?part=snippet&id={video_id}"
 
-    response = requests.get(url)
+    response = await app.state.http.get(url)
     if response.status_code == 200:
         data = response.json()
         if 'items' in data and len(data['items']) > 0:
             snippet = data['items'][0]['snippet']
-            return {
+            metainfo = {
                 'title': snippet['title'],
                 'description': snippet['description']
             }
+            metainfo_cache[video_id] = metainfo
+            return metainfo
 
     return {
         'title': 'NaN',
         'description': 'NaN'
     }
 
+@lru_cache(maxsize=4096)
 def get_video_id(youtube_url):
     """
     Extracts the video ID from various forms of YouTube URLs.
     """
-    parsed_url = urlparse(youtube_url)
-
-    if parsed_url.hostname in ('youtu.be', 'www.youtu.be'):
-        return parsed_url.path.lstrip('/')
-
-    if parsed_url.hostname in ('youtube.com', 'www.youtube.com'):
-        if parsed_url.path == '/watch':
-            return parse_qs(parsed_url.query)['v'][0]
-        if parsed_url.path.startswith(('/embed/', '/v/')):
-            return parsed_url.path.split('/')[2]
-
-    raise ValueError("Invalid YouTube URL")
+    match = VIDEO_ID_RE.match(youtube_url)
+    if not match:
+        raise ValueError("Invalid YouTube URL")
+    return match.group(1)
 
 def format_transcript_with_timestamps(transcript):
     """
     Formats the transcript with timestamps.
     """
-    formatted_transcript = []
+    # Each line is "[HH:MM:SS] text", start time converted from seconds
+    fmt = "[{:02}:{:02}:{:02}] {}".format
+    lines = []
     for entry in transcript:
-        start_time = entry['start']
-        text = entry['text']
-
-        # Convert start time from seconds to a readable format (HH:MM:SS)
-        hours, remainder = divmod(start_time, 3600)
-        minutes, seconds = divmod(remainder, 60)
-        timestamp = f"{int(hours):02}:{int(minutes):02}:{int(seconds):02}"
+        minutes, seconds = divmod(int(entry['start']), 60)
+        hours, minutes = divmod(minutes, 60)
+        lines.append(fmt(hours, minutes, seconds, entry['text']))
+
+    return "\n".join(lines)
+
+@app.on_event("startup")
+async def startup():
+    global write_queue, redis_client
+    init_db()
+    if REDIS_URL:
+        redis_client = redis.from_url(REDIS_URL, socket_connect_timeout=REDIS_TIMEOUT, socket_timeout=REDIS_TIMEOUT)
+    # Shared keep-alive client for the YouTube Data API
+    app.state.http = httpx.AsyncClient(timeout=5.0, http2=True,
+                                       limits=httpx.Limits(max_keepalive_connections=32, max_connections=64),
+                                       headers={'X-Goog-Api-Key': YOUTUBE_KEY} if YOUTUBE_KEY else None)
+    write_queue = asyncio.Queue(maxsize=WRITE_QUEUE_SIZE)
+    app.state.writer = asyncio.create_task(video_writer())
+
+@app.on_event("shutdown")
+async def shutdown():
+    # Let the writer flush queued rows before exiting
+    await write_queue.put(None)
+    await app.state.writer
+    await app.state.http.aclose()
+    await asyncio.gather(*background_tasks, return_exceptions=True)
+    if redis_client is not None:
+        await redis_client.aclose()
+
+def transcript_etag(video_id, plain_text):
+    # Stored transcripts never change, so the video ID and the representation identify the content
+    return f'W/"{video_id}-txt"' if plain_text else f'W/"{video_id}-json"'
+
+def strip_weak(tag):
+    tag = tag.strip()
+    return tag[2:] if tag.startswith('W/') else tag
+
+def etag_matches(http_request, etag):
+    """
+    Checks If-None-Match using weak comparison, so W/"x" and "x" match each other.
+    """
+    if_none_match = http_request.headers.get('if-none-match')
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    etag = strip_weak(etag)
+    return any(strip_weak(tag) == etag for tag in if_none_match.split(','))
+
+def accept_quality(accept, media_type):
+    """
+    Returns the q-value the Accept header gives to media_type, using its most specific matching range.
+    """
+    main_type = media_type.split('/')[0]
+    best_specificity, best_q = -1, 0.0
+    for item in accept.split(','):
+        parts = [part.strip() for part in item.split(';')]
+        media_range = parts[0].lower()
+        if media_range == media_type:
+            specificity = 2
+        elif media_range == f'{main_type}/*':
+            specificity = 1
+        elif media_range == '*/*':
+            specificity = 0
+        else:
+            continue
+        q = 1.0
+        for param in parts[1:]:
+            name, _, value = param.partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if specificity > best_specificity:
+            best_specificity, best_q = specificity, q
+    return best_q
+
+def wants_plain_text(http_request):
+    """
+    Plain text is served only if the client ranks text/plain strictly above application/json.
+    """
+    accept = http_request.headers.get('accept')
+    if not accept:
+        return False
+    text_q = accept_quality(accept, 'text/plain')
+    return text_q > 0 and text_q > accept_quality(accept, 'application/json')
 
-        # Append the formatted string to the list
-        formatted_transcript.append(f"[{timestamp}] {text}")
+def transcript_response(http_request, video_id, transcript, stored=True):
+    """
+    Returns the transcript as plain text if the client prefers it, otherwise as JSON.
+    For stored videos, responds with 304 if the client already holds the same representation.
 
-    return "\n".join(formatted_transcript)
+    The endpoint is POST, for which RFC 9110 asks for 412 on a matching If-None-Match. This API
+    deliberately answers 304 so its own clients can revalidate a cached transcript. POST responses
+    are not cacheable by intermediaries, so no Cache-Control header is sent.
+    """
+    plain_text = wants_plain_text(http_request)
+    etag = transcript_etag(video_id, plain_text)
+    if stored and etag_matches(http_request, etag):
+        logger.info(f"Video {video_id} not modified.")
+        return Response(status_code=304, headers={'ETag': etag, 'Vary': 'Accept'})
+    headers = {'ETag': etag, 'Vary': 'Accept'}
+    if plain_text:
+        return PlainTextResponse(transcript, headers=headers)
+    return ORJSONResponse({"transcript": transcript}, headers=headers)
 
 @app.get("/health")
 async def health_check():
@@ -147,34 +505,36 @@ async def health_check():
 class DatabaseStatus(BaseModel):
     total_videos: int
     video_ids: List[str]
+    cache_info: Dict[str, int]
 
 @app.get("/get_database_status", response_model=DatabaseStatus)
-async def get_database_status():
+def get_database_status(limit: Optional[int] = Query(None, ge=1), offset: int = Query(0, ge=0)):
     """
     Endpoint to get the status of the database, including total number of videos and list of video IDs.
+    Use limit and offset to page through the video IDs, all are returned by default.
     """
     try:
-        conn = get_db_connection()
-        c = conn.cursor()
-
-        # Get total number of videos
-        c.execute('SELECT COUNT(*) FROM videos')
-        total_videos = c.fetchone()[0]
-
-        # Get list of video IDs
-        c.execute('SELECT video_id FROM videos')
-        video_ids = [row[0] for row in c.fetchall()]
-
-        conn.close()
-
-        return DatabaseStatus(total_videos=total_videos, video_ids=video_ids)
+        with get_db_connection() as conn:
+            # Total number of videos and one page of video IDs in a single statement. ORDER BY is served by
+            # the video_id index, so the page is read in order without sorting. LIMIT -1 means no limit
+            c = conn.execute('SELECT (SELECT COUNT(*) FROM videos), video_id FROM videos ORDER BY video_id LIMIT ? OFFSET ?',
+                             (-1 if limit is None else limit, offset))
+            rows = c.fetchall()
+            video_ids = [row[1] for row in rows]
+            if rows:
+                total_videos = rows[0][0]
+            else:
+                # Empty table or offset past the end returns no row to carry the count
+                total_videos = conn.execute('SELECT COUNT(*) FROM videos').fetchone()[0]
+
+        return DatabaseStatus(total_videos=total_videos, video_ids=video_ids, cache_info=video_cache.info())
 
     except Exception as e:
         logger.error(f"Failed to get database status: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to get database status: {str(e)}")
 
 @app.post("/get_transcript/")
-async def get_transcript(request: VideoRequest):
+async def get_transcript(request: VideoRequest, http_request: Request):
     """
     Endpoint to get the transcript of a YouTube video.
     """
@@ -183,28 +543,30 @@ async def get_transcript(request: VideoRequest):
         video_id = get_video_id(str(request.url))
         logger.info(f'Processing video ID: {video_id}')
 
-        # Check if the video has already been processed
-        existing_data = get_video_from_db(video_id)
+        # Check if the video has already been processed, conditional requests are only answered for stored videos
+        existing_data = await get_stored_video(video_id)
         if existing_data:
             logger.info(f"Video {video_id} found in database. Returning stored data.")
-            return {"transcript": existing_data['transcript']}
+            return transcript_response(http_request, video_id, existing_data['transcript'])
 
         # If not in database, process the video
         logger.info(f'Processing new video: {video_id}')
 
-        # Fetch the transcript using the video ID
-        transcript = YouTubeTranscriptApi.get_transcript(video_id,languages=['en','fi'])
+        # Fetch the transcript and the video description concurrently
+        transcript, metainfo = await asyncio.gather(
+            asyncio.to_thread(YouTubeTranscriptApi.get_transcript, video_id, languages=['en','fi']),
+            get_video_description(video_id),
+        )
         logger.info(f'Transcript has length {len(transcript)}')
 
-        # Fetch the video description
-        metainfo = get_video_description(video_id)
+        # Each formatted line adds a 10-char "[HH:MM:SS]" prefix, a space and a newline,
+        # so the formatted length is known before doing the formatting pass
+        if sum(len(entry['text']) for entry in transcript) + 12 * len(transcript) - 1 <= 500:
+            raise ValueError("Transcript too short!")
 
         # Format the transcript with timestamps
         formatted_transcript = format_transcript_with_timestamps(transcript)
 
-        if len(formatted_transcript) <= 500:
-            raise ValueError("Transcript too short!")
-
         formatted_transcript += '\nEND_OF_TRANSCRIPT'
 
         output = 'Title: ' + metainfo['title'].strip() + '\n\n' + formatted_transcript
@@ -212,17 +574,18 @@ async def get_transcript(request: VideoRequest):
         logger.info(f'Success! Final transcript length is {len(output)} with {len(output.splitlines())} lines')
 
         # Store the data in the database
-        insert_video_data(video_id, str(request.url), metainfo['title'], metainfo['description'], output)
-        logger.info(f'Added new video into database')
+        # Compressed once, the same bytes go to the database and to Redis
+        compressed = await asyncio.to_thread(compress_transcript, output)
+        await insert_video_data(video_id, str(request.url), metainfo['title'], metainfo['description'], output, compressed)
+        logger.info(f'Queued new video for database')
+        run_in_background(redis_set_transcript(video_id, compressed))
 
-        return {"transcript": output}
+        return transcript_response(http_request, video_id, output, stored=False)
 
     except Exception as e:
         logger.error(f"Failed to process video: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to obtain transcript: {str(e)}")
 
-init_db()
-
 # # TESTING
 # if 0:
 #     test_url = "https://www.youtube.com/watch?v=aQ4yQXeB1Ss"  # Example URL for testing
@@ -240,5 +603,7 @@ init_db()
 #     output = 'Title: ' + metainfo['title'].strip() + '\n\n' + formatted_transcript
 #     insert_video_data(video_id,test_url, metainfo['title'], metainfo['description'], output)
 
-#if __name__ == "__main__":
-#    uvicorn.run(app, host="0.0.0.0", port=8000)
+if __name__ == "__main__":
+    uvicorn.run("app:app", host="0.0.0.0", port=8000,
+                workers=int(os.getenv("WEB_CONCURRENCY", os.cpu_count() or 1)),
+                loop="uvloop", http="httptools", log_level="info")